@@ -1,12 +1,19 @@
 from fastapi import FastAPI, HTTPException, Body
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
 from pydantic import BaseModel
-from typing import Optional, Dict, Any, List
-import google.generativeai as genai
+from typing import Optional, Dict, Any, List, Callable
 import os
 from dotenv import load_dotenv
 import json
 import re
+import asyncio
+import hashlib
+import socket
+import threading
+import time
+import importlib.util
+from contextlib import contextmanager
 
 # For generation:
 import subprocess
@@ -14,11 +21,33 @@ import tempfile
 import shutil
 from pathlib import Path
 
+from shared_state import LockTimeout, StateBackend, get_state_backend
+
 # Load environment variables
 load_dotenv()
 
-# Configure Gemini
-genai.configure(api_key=os.getenv("GOOGLE_API_KEY"))
+# The Gemini SDK pulls in grpc and protobuf, so it is imported and configured on first use
+_genai = None
+_genai_lock = threading.Lock()
+
+LLM_MODEL_NAME = 'gemini-2.5-pro-preview-05-06'
+
+# Multi-worker settings
+LLM_CACHE_TTL = int(os.getenv("SHIPWRIGHT_LLM_CACHE_TTL", "86400"))
+SCAFFOLD_LOCK_TIMEOUT = float(os.getenv("SHIPWRIGHT_LOCK_TIMEOUT", "600"))
+# Unset means shutdown waits for open HTTP generations as long as it waits for queued jobs
+DRAIN_TIMEOUT = os.getenv("SHIPWRIGHT_DRAIN_TIMEOUT")
+JOB_POLL_INTERVAL = float(os.getenv("SHIPWRIGHT_JOB_POLL_INTERVAL", "1.0"))
+JOB_LEASE = float(os.getenv("SHIPWRIGHT_JOB_LEASE", "120"))
+JOB_CONCURRENCY = int(os.getenv("SHIPWRIGHT_JOB_CONCURRENCY", "1"))
+JOB_WORKER_ENABLED = os.getenv("SHIPWRIGHT_JOB_WORKER", "1") != "0"
+TOOLCHAIN_CHECK_TTL = float(os.getenv("SHIPWRIGHT_TOOLCHAIN_CHECK_TTL", "60"))
+PRELOAD_LLM = os.getenv("SHIPWRIGHT_PRELOAD_LLM", "0") == "1"
+WORKER_ID = f"{socket.gethostname()}:{os.getpid()}"
+
+# Job state, LLM cache and scaffold locks are shared by every worker
+_state: Optional[StateBackend] = None
+_state_lock = threading.Lock()
 
 app = FastAPI(
     title="Shipwright AI API",
@@ -81,12 +110,68 @@ class GenerateFullProjectResponse(BaseModel):
     cicd: Optional[str] = None
     message: str
 
+class GenerationJobResponse(BaseModel):
+    job_id: str
+    status: str  # 'queued', 'running', 'succeeded' or 'failed'
+    result: Optional[GenerateFullProjectResponse] = None
+    error: Optional[str] = None
+
 HEAVYWEIGHT_STACKS = {".net", "node.js", "nodejs", "django"}
 
 def is_heavyweight(stack: TechStack) -> bool:
     all_techs = set((stack.frontend or []) + (stack.backend or []) + [stack.database or "", stack.deployment or ""])
     return any(tech.lower() in HEAVYWEIGHT_STACKS for tech in all_techs)
 
+def get_state() -> StateBackend:
+    """Build the shared state backend on first use, so importing this module has no side effects"""
+    global _state
+    if _state is None:
+        with _state_lock:
+            if _state is None:
+                _state = get_state_backend(Path(__file__).resolve().parent.parent / "Projects")
+    return _state
+
+def get_genai():
+    """Import and configure the Gemini SDK the first time an LLM call needs it"""
+    global _genai
+    if _genai is None:
+        with _genai_lock:
+            if _genai is None:
+                import google.generativeai as genai
+                genai.configure(api_key=os.getenv("GOOGLE_API_KEY"))
+                _genai = genai
+    return _genai
+
+def generate_llm_text(prompt: str, parse: Optional[Callable[[str], Any]] = None) -> str:
+    """Run a prompt through Gemini, reusing responses cached by any worker.
+
+    A response is only cached once `parse` accepts it, so malformed output is
+    retried on the next request instead of being served to every worker.
+    """
+    cache_key = "llm:" + hashlib.sha256(f"{LLM_MODEL_NAME}\n{prompt}".encode()).hexdigest()
+    cached = get_state().cache_get(cache_key)
+    if cached is not None:
+        return cached
+    model = get_genai().GenerativeModel(LLM_MODEL_NAME)
+    text = model.generate_content(prompt).text
+    if parse is not None:
+        parse(text)
+    get_state().cache_set(cache_key, text, LLM_CACHE_TTL)
+    return text
+
+@contextmanager
+def scaffold_lock(name: str):
+    """Serialize scaffolding of the same project directory across all workers.
+
+    Yields the held lock; check `ensure_held()` before writing and skip cleanup
+    once it is `lost`, since another worker may own the directory by then.
+    """
+    try:
+        with get_state().lock(f"scaffold:{name}", timeout=SCAFFOLD_LOCK_TIMEOUT) as held:
+            yield held
+    except LockTimeout:
+        raise HTTPException(status_code=409, detail=f"Another worker is still generating '{name}', try again later")
+
 def generate_dotnet_project(project_name: str, base_dir: Path) -> Path:
     project_dir = base_dir / project_name
     if project_dir.exists():
@@ -336,8 +421,6 @@ def setup_django_database(project_path: Path, database_type: str) -> None:
 def generate_gitlab_ci_yaml(tech_stack: TechStack) -> str:
     """Generate GitLab CI/CD YAML using LLM"""
     try:
-        model = genai.GenerativeModel('gemini-2.5-pro-preview-05-06')
-        
         prompt = f"""
         You are a CI/CD expert. Generate a complete .gitlab-ci.yml file for a project with the following tech stack:
         
@@ -360,10 +443,10 @@ def generate_gitlab_ci_yaml(tech_stack: TechStack) -> str:
         Return the complete .gitlab-ci.yml content:
         """
         
-        response = model.generate_content(prompt)
+        response_text = generate_llm_text(prompt)
         
         # Clean the response - remove any markdown formatting
-        yaml_content = response.text.strip()
+        yaml_content = response_text.strip()
         yaml_content = re.sub(r'```yaml\s*', '', yaml_content)
         yaml_content = re.sub(r'```\s*$', '', yaml_content)
         
@@ -412,12 +495,98 @@ async def root():
 async def health_check():
     return {"status": "healthy"}
 
+def llm_client_status() -> Dict[str, bool]:
+    """Report whether the Gemini SDK can be used, without importing it"""
+    try:
+        sdk_installed = importlib.util.find_spec("google.generativeai") is not None
+    except ModuleNotFoundError:
+        sdk_installed = False
+    api_key_configured = bool(os.getenv("GOOGLE_API_KEY"))
+    return {
+        "available": sdk_installed and api_key_configured,
+        "sdk_installed": sdk_installed,
+        "api_key_configured": api_key_configured,
+        "loaded": _genai is not None
+    }
+
+def probe_toolchains() -> Dict[str, bool]:
+    """Check the CLIs used for scaffolding"""
+    try:
+        # `python3 -m venv --help` works without ensurepip (e.g. Debian without python3-venv),
+        # but creating the Django venv does not
+        venv_available = shutil.which("python3") is not None and subprocess.run(
+            ["python3", "-c", "import venv, ensurepip"], capture_output=True, timeout=10
+        ).returncode == 0
+    except (OSError, subprocess.TimeoutExpired):
+        venv_available = False
+    return {
+        "npx": shutil.which("npx") is not None,
+        "npm": shutil.which("npm") is not None,
+        "dotnet": shutil.which("dotnet") is not None,
+        "python3_venv": venv_available
+    }
+
+_toolchains: Optional[Dict[str, bool]] = None
+_toolchains_checked_at = 0.0
+
+def toolchain_status() -> Dict[str, bool]:
+    """Return the toolchain probe, re-running it at most every TOOLCHAIN_CHECK_TTL seconds
+    so toolchains installed after startup are picked up"""
+    global _toolchains, _toolchains_checked_at
+    if _toolchains is None or time.monotonic() - _toolchains_checked_at > TOOLCHAIN_CHECK_TTL:
+        _toolchains = probe_toolchains()
+        _toolchains_checked_at = time.monotonic()
+    return _toolchains
+
+def state_backend_status() -> bool:
+    try:
+        return get_state().ping()
+    except Exception as e:
+        print(f"State backend unavailable: {str(e)}")
+        return False
+
+@app.get("/ready")
+async def readiness_check():
+    """Readiness for routing traffic; the LLM client and toolchains are reported separately
+    so CLI-only generations can be served before (or without) the LLM stack"""
+    loop = asyncio.get_running_loop()
+    toolchains = await loop.run_in_executor(None, toolchain_status)
+    state_backend = await loop.run_in_executor(None, state_backend_status)
+    return JSONResponse(
+        status_code=200 if state_backend else 503,
+        content={
+            "status": "ready" if state_backend else "not ready",
+            "state_backend": state_backend,
+            "llm": llm_client_status(),
+            "toolchains": toolchains
+        }
+    )
+
+def clean_json_response(response_text: str) -> str:
+    """Strip markdown code block markers and whitespace from an LLM JSON response"""
+    cleaned_text = re.sub(r'```json\s*', '', response_text)
+    cleaned_text = re.sub(r'```\s*$', '', cleaned_text)
+    return cleaned_text.strip()
+
+def parse_tech_stack_response(response_text: str) -> Dict[str, Any]:
+    """Pull the tech stack JSON object out of a Gemini response"""
+    cleaned_text = clean_json_response(response_text)
+    try:
+        # Try to parse the cleaned response as JSON
+        return json.loads(cleaned_text)
+    except json.JSONDecodeError:
+        # If JSON parsing fails, try to extract JSON from the text
+        json_match = re.search(r'\{.*\}', cleaned_text, re.DOTALL)
+        if json_match:
+            return json.loads(json_match.group())
+        raise HTTPException(
+            status_code=500,
+            detail=f"Failed to parse AI response as JSON. Raw response: {response_text}"
+        )
+
 @app.post("/api/ai/extract-tech-stack", response_model=TechStackResponse)
-async def extract_tech_stack(request: TechStackRequest):
+def extract_tech_stack(request: TechStackRequest):
     try:
-        # Initialize Gemini model
-        model = genai.GenerativeModel('gemini-2.5-pro-preview-05-06')
-        
         # Create the prompt for tech stack extraction
         prompt = f"""
         You are a tech stack analyzer. Your task is to analyze the project description and return ONLY a JSON object with the technology stack and the project name.
@@ -437,33 +606,14 @@ async def extract_tech_stack(request: TechStackRequest):
         Additional context: {request.additional_context if request.additional_context else 'None'}
         """
         
-        # Generate response from Gemini
-        response = model.generate_content(prompt)
+        # Generate response from Gemini; identical prompts reuse the cached answer
+        response_text = generate_llm_text(prompt, parse=parse_tech_stack_response)
         
         # Print raw response for debugging
-        print("Raw response:", response.text)
-        
-        # Clean the response text
-        cleaned_text = response.text
-        # Remove markdown code block markers if present
-        cleaned_text = re.sub(r'```json\s*', '', cleaned_text)
-        cleaned_text = re.sub(r'```\s*$', '', cleaned_text)
-        # Remove any leading/trailing whitespace
-        cleaned_text = cleaned_text.strip()
+        print("Raw response:", response_text)
         
-        try:
-            # Try to parse the cleaned response as JSON
-            tech_stack_data = json.loads(cleaned_text)
-        except json.JSONDecodeError as e:
-            # If JSON parsing fails, try to extract JSON from the text
-            json_match = re.search(r'\{.*\}', cleaned_text, re.DOTALL)
-            if json_match:
-                tech_stack_data = json.loads(json_match.group())
-            else:
-                raise HTTPException(
-                    status_code=500,
-                    detail=f"Failed to parse AI response as JSON. Raw response: {response.text}"
-                )
+        cleaned_text = clean_json_response(response_text)
+        tech_stack_data = parse_tech_stack_response(response_text)
         
         # Create TechStack object from the response
         tech_stack = TechStack(
@@ -479,10 +629,10 @@ async def extract_tech_stack(request: TechStackRequest):
             tech_stack=tech_stack,
             confidence=0.95,
             metadata={
-                "model": "gemini-2.5-pro-preview-05-06",
+                "model": LLM_MODEL_NAME,
                 "prompt_tokens": len(prompt.split()),
-                "response_tokens": len(response.text.split()),
-                "raw_response": response.text,
+                "response_tokens": len(response_text.split()),
+                "raw_response": response_text,
                 "cleaned_response": cleaned_text
             }
         )
@@ -490,8 +640,20 @@ async def extract_tech_stack(request: TechStackRequest):
         print(f"Error: {str(e)}")  # Print error for debugging
         raise HTTPException(status_code=500, detail=str(e))
     
+def select_backend_stack(tech_stack: TechStack) -> Optional[str]:
+    """Pick the CLI used to scaffold the backend: '.net', 'node.js', 'django' or None"""
+    all_techs = set((tech_stack.frontend or []) + (tech_stack.backend or []) + 
+                  [tech_stack.database or "", tech_stack.deployment or ""])
+    if any(tech.lower() in {".net"} for tech in all_techs):
+        return ".net"
+    if any(tech.lower() in {"node.js", "nodejs"} for tech in all_techs):
+        return "node.js"
+    if any(tech.lower() in {"django"} for tech in all_techs):
+        return "django"
+    return None
+
 @app.post("/api/project/generate_backend", response_model=GenerateProjectResponse)
-async def generate_backend_project(request: GenerateProjectRequest):
+def generate_backend_project(request: GenerateProjectRequest):
     # Use the name from tech_stack if available, otherwise use the request name
     project_name = request.tech_stack.name or request.name
     # Create Projects directory at the root level
@@ -499,54 +661,58 @@ async def generate_backend_project(request: GenerateProjectRequest):
     projects_dir = root_dir / "Projects"
     backend_dir = projects_dir / "backend"
     backend_dir.mkdir(parents=True, exist_ok=True)
-    
-    project_path = backend_dir / project_name
 
-    try:
-        # Check which heavyweight stack to use
-        all_techs = set((request.tech_stack.frontend or []) + (request.tech_stack.backend or []) + 
-                      [request.tech_stack.database or "", request.tech_stack.deployment or ""])
-        
-        if any(tech.lower() in {".net"} for tech in all_techs):
-            generated_path = generate_dotnet_project(project_name, backend_dir)
-            if request.tech_stack.database:
-                setup_dotnet_database(generated_path, request.tech_stack.database)
-            return GenerateProjectResponse(
-                type="cli",
-                project_path=str(generated_path),
-                message=f"Backend created using .NET CLI with {request.tech_stack.database or 'no'} database"
-            )
-        elif any(tech.lower() in {"node.js", "nodejs"} for tech in all_techs):
-            generated_path = generate_nodejs_project(project_name, backend_dir)
-            if request.tech_stack.database:
-                setup_nodejs_database(generated_path, request.tech_stack.database)
-            return GenerateProjectResponse(
-                type="cli",
-                project_path=str(generated_path),
-                message=f"Backend created using Node.js CLI with {request.tech_stack.database or 'no'} database"
-            )
-        elif any(tech.lower() in {"django"} for tech in all_techs):
-            generated_path = generate_django_project(project_name, backend_dir)
-            if request.tech_stack.database:
-                setup_django_database(generated_path, request.tech_stack.database)
-            return GenerateProjectResponse(
-                type="cli",
-                project_path=str(generated_path),
-                message=f"Backend created using Django CLI with {request.tech_stack.database or 'no'} database"
-            )
-        else:
-            raise HTTPException(
-                status_code=400, 
-                detail="Only .NET, Node.js, and Django backends are supported. Please specify one of these technologies in your tech stack."
-            )
+    backend_stack = select_backend_stack(request.tech_stack)
+    if backend_stack is None:
+        raise HTTPException(
+            status_code=400, 
+            detail="Only .NET, Node.js, and Django backends are supported. Please specify one of these technologies in your tech stack."
+        )
 
-    except Exception as e:
-        if project_path.exists():
-            shutil.rmtree(project_path, ignore_errors=True)
-        raise HTTPException(status_code=500, detail=str(e))
+    # Django sanitizes the project name, so lock and clean up the directory it actually writes
+    directory_name = sanitize_python_identifier(project_name) if backend_stack == "django" else project_name
+    project_path = backend_dir / directory_name
+
+    with scaffold_lock(f"backend:{directory_name}") as lock:
+        try:
+            if backend_stack == ".net":
+                generated_path = generate_dotnet_project(project_name, backend_dir)
+                lock.ensure_held()
+                if request.tech_stack.database:
+                    setup_dotnet_database(generated_path, request.tech_stack.database)
+                return GenerateProjectResponse(
+                    type="cli",
+                    project_path=str(generated_path),
+                    message=f"Backend created using .NET CLI with {request.tech_stack.database or 'no'} database"
+                )
+            elif backend_stack == "node.js":
+                generated_path = generate_nodejs_project(project_name, backend_dir)
+                lock.ensure_held()
+                if request.tech_stack.database:
+                    setup_nodejs_database(generated_path, request.tech_stack.database)
+                return GenerateProjectResponse(
+                    type="cli",
+                    project_path=str(generated_path),
+                    message=f"Backend created using Node.js CLI with {request.tech_stack.database or 'no'} database"
+                )
+            else:
+                generated_path = generate_django_project(project_name, backend_dir)
+                lock.ensure_held()
+                if request.tech_stack.database:
+                    setup_django_database(generated_path, request.tech_stack.database)
+                return GenerateProjectResponse(
+                    type="cli",
+                    project_path=str(generated_path),
+                    message=f"Backend created using Django CLI with {request.tech_stack.database or 'no'} database"
+                )
+
+        except Exception as e:
+            if project_path.exists() and not lock.lost:
+                shutil.rmtree(project_path, ignore_errors=True)
+            raise HTTPException(status_code=500, detail=str(e))
 
 @app.post("/api/project/generate_frontend", response_model=GenerateFrontendResponse)
-async def generate_frontend_project(request: GenerateFrontendRequest):
+def generate_frontend_project(request: GenerateFrontendRequest):
     # Use the name from tech_stack if available, otherwise use the request name
     project_name = request.tech_stack.name or request.name
     
@@ -560,65 +726,66 @@ async def generate_frontend_project(request: GenerateFrontendRequest):
     safe_name = project_name.lower().replace(' ', '-')
     project_path = frontend_dir / safe_name
 
-    try:
-        frontend_stack = [tech.lower() for tech in (request.tech_stack.frontend or [])]
-        if "react" in frontend_stack:
-            generated_path = generate_react_project(project_name, frontend_dir)
-            return GenerateFrontendResponse(
-                type="cli",
-                project_path=str(generated_path),
-                message="Frontend created using create-react-app"
-            )
-        elif "angular" in frontend_stack:
-            generated_path = generate_angular_project(project_name, frontend_dir)
-            return GenerateFrontendResponse(
-                type="cli",
-                project_path=str(generated_path),
-                message="Frontend created using Angular CLI"
-            )
-        elif "vue" in frontend_stack:
-            generated_path = generate_vue_project(project_name, frontend_dir)
-            return GenerateFrontendResponse(
-                type="cli",
-                project_path=str(generated_path),
-                message="Frontend created using Vue CLI"
-            )
-        else:
-            # AI-generated frontend
-            model = genai.GenerativeModel('gemini-2.5-pro-preview-05-06')
-            ai_prompt = f"""
-            You are a code generator. Based on this stack: {request.tech_stack.dict()} — create a minimal working frontend project.
-            Only return a JSON list of files like this:
-            [
-                {{"path": "index.html", "content": "<!DOCTYPE html>..."}},
-                {{"path": "styles.css", "content": "body {{ margin: 0; }}"}}
-            ]
-            """
-            response = model.generate_content(ai_prompt)
-            files = json.loads(response.text.strip())
-
-            if project_path.exists():
-                shutil.rmtree(project_path)
-            project_path.mkdir(parents=True, exist_ok=True)
-
-            for file in files:
-                file_path = project_path / file["path"]
-                file_path.parent.mkdir(parents=True, exist_ok=True)
-                file_path.write_text(file["content"])
-
-            return GenerateFrontendResponse(
-                type="ai",
-                project_path=str(project_path),
-                message="Frontend created using AI"
-            )
+    with scaffold_lock(f"frontend:{safe_name}") as lock:
+        try:
+            frontend_stack = [tech.lower() for tech in (request.tech_stack.frontend or [])]
+            if "react" in frontend_stack:
+                generated_path = generate_react_project(project_name, frontend_dir)
+                return GenerateFrontendResponse(
+                    type="cli",
+                    project_path=str(generated_path),
+                    message="Frontend created using create-react-app"
+                )
+            elif "angular" in frontend_stack:
+                generated_path = generate_angular_project(project_name, frontend_dir)
+                return GenerateFrontendResponse(
+                    type="cli",
+                    project_path=str(generated_path),
+                    message="Frontend created using Angular CLI"
+                )
+            elif "vue" in frontend_stack:
+                generated_path = generate_vue_project(project_name, frontend_dir)
+                return GenerateFrontendResponse(
+                    type="cli",
+                    project_path=str(generated_path),
+                    message="Frontend created using Vue CLI"
+                )
+            else:
+                # AI-generated frontend
+                ai_prompt = f"""
+                You are a code generator. Based on this stack: {request.tech_stack.dict()} — create a minimal working frontend project.
+                Only return a JSON list of files like this:
+                [
+                    {{"path": "index.html", "content": "<!DOCTYPE html>..."}},
+                    {{"path": "styles.css", "content": "body {{ margin: 0; }}"}}
+                ]
+                """
+                response_text = generate_llm_text(ai_prompt, parse=lambda text: json.loads(text.strip()))
+                files = json.loads(response_text.strip())
+
+                lock.ensure_held()
+                if project_path.exists():
+                    shutil.rmtree(project_path)
+                project_path.mkdir(parents=True, exist_ok=True)
+
+                for file in files:
+                    file_path = project_path / file["path"]
+                    file_path.parent.mkdir(parents=True, exist_ok=True)
+                    file_path.write_text(file["content"])
+
+                return GenerateFrontendResponse(
+                    type="ai",
+                    project_path=str(project_path),
+                    message="Frontend created using AI"
+                )
 
-    except Exception as e:
-        if project_path.exists():
-            shutil.rmtree(project_path, ignore_errors=True)
-        raise HTTPException(status_code=500, detail=str(e))
+        except Exception as e:
+            if project_path.exists() and not lock.lost:
+                shutil.rmtree(project_path, ignore_errors=True)
+            raise HTTPException(status_code=500, detail=str(e))
 
 @app.post("/api/project/generate_cicd")
-async def generate_cicd_pipeline(tech_stack: TechStack):
+def generate_cicd_pipeline(tech_stack: TechStack):
     """Generate GitLab CI/CD pipeline YAML for the given tech stack"""
     try:
         yaml_content = generate_gitlab_ci_yaml(tech_stack)
@@ -627,7 +794,7 @@ async def generate_cicd_pipeline(tech_stack: TechStack):
         raise HTTPException(status_code=500, detail=f"Failed to generate CI/CD pipeline: {str(e)}")
 
 @app.post("/api/project/generate_full", response_model=GenerateFullProjectResponse)
-async def generate_full_project(request: GenerateFullProjectRequest = Body(...)):
+def generate_full_project(request: GenerateFullProjectRequest = Body(...)):
     backend_result = None
     frontend_result = None
     cicd_yaml = None
@@ -641,13 +808,13 @@ async def generate_full_project(request: GenerateFullProjectRequest = Body(...))
     projects_dir.mkdir(parents=True, exist_ok=True)
 
     if has_backend:
-        backend_result = await generate_backend_project(GenerateProjectRequest(
+        backend_result = generate_backend_project(GenerateProjectRequest(
             name=request.name,
             tech_stack=request.tech_stack
         ))
         messages.append(f"Backend: {backend_result.message}")
     if has_frontend:
-        frontend_result = await generate_frontend_project(GenerateFrontendRequest(
+        frontend_result = generate_frontend_project(GenerateFrontendRequest(
             name=request.name,
             tech_stack=request.tech_stack
         ))
@@ -663,8 +830,9 @@ async def generate_full_project(request: GenerateFullProjectRequest = Body(...))
         # Save the .gitlab-ci.yml file at the project root
         project_name = request.tech_stack.name or request.name
         cicd_file_path = projects_dir / ".gitlab-ci.yml"
-        with open(cicd_file_path, "w") as f:
-            f.write(cicd_yaml)
+        with scaffold_lock("cicd"):
+            with open(cicd_file_path, "w") as f:
+                f.write(cicd_yaml)
             
     except Exception as e:
         messages.append(f"CI/CD: Failed to generate pipeline - {str(e)}")
@@ -676,6 +844,135 @@ async def generate_full_project(request: GenerateFullProjectRequest = Body(...))
         message=" | ".join(messages)
     )
 
+def run_generation_job(job: Dict[str, Any]) -> None:
+    """Execute a queued job claimed by this worker and record its outcome"""
+    finished = threading.Event()
+
+    def keep_alive():
+        # Renew the lease so other workers only reclaim the job if this worker dies
+        while not finished.wait(JOB_LEASE / 3):
+            try:
+                if not get_state().heartbeat_job(job["id"], WORKER_ID):
+                    return
+            except Exception as e:
+                print(f"Failed to renew lease on job {job['id']}: {str(e)}")
+
+    heartbeat = threading.Thread(target=keep_alive, daemon=True)
+    heartbeat.start()
+    try:
+        if job["kind"] != "generate_full":
+            raise ValueError(f"Unknown job kind: {job['kind']}")
+        request = GenerateFullProjectRequest(**job["payload"])
+        result = generate_full_project(request)
+        get_state().finish_job(job["id"], WORKER_ID, result=result.dict())
+    except Exception as e:
+        print(f"Job {job['id']} failed: {str(e)}")
+        get_state().finish_job(job["id"], WORKER_ID, error=str(e))
+    finally:
+        finished.set()
+        heartbeat.join()
+
+in_flight_jobs: Dict[str, asyncio.Future] = {}
+stop_claiming: Optional[asyncio.Event] = None
+job_loop_task: Optional[asyncio.Task] = None
+
+async def job_worker_loop():
+    """Claim queued jobs from the shared backend until shutdown starts"""
+    loop = asyncio.get_running_loop()
+    while not stop_claiming.is_set():
+        job = None
+        if len(in_flight_jobs) < JOB_CONCURRENCY:
+            try:
+                job = await loop.run_in_executor(None, get_state().claim_job, WORKER_ID, JOB_LEASE)
+            except Exception as e:
+                print(f"Failed to claim job: {str(e)}")
+        if job is not None and stop_claiming.is_set():
+            # Shutdown started while the claim was in flight; leave the job to another worker
+            try:
+                await loop.run_in_executor(None, get_state().requeue_job, job["id"])
+            except Exception as e:
+                # The lease lapses on its own, so another worker still reclaims the job
+                print(f"Failed to requeue job {job['id']}: {str(e)}")
+            break
+        if job is None:
+            try:
+                await asyncio.wait_for(stop_claiming.wait(), timeout=JOB_POLL_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+            continue
+        future = loop.run_in_executor(None, run_generation_job, job)
+        in_flight_jobs[job["id"]] = future
+        future.add_done_callback(lambda _, job_id=job["id"]: in_flight_jobs.pop(job_id, None))
+
+@app.on_event("startup")
+async def start_job_worker():
+    global stop_claiming, job_loop_task
+    stop_claiming = asyncio.Event()
+    # Surface state backend misconfiguration at startup rather than on the first request
+    await asyncio.get_running_loop().run_in_executor(None, get_state)
+    if JOB_WORKER_ENABLED:
+        job_loop_task = asyncio.create_task(job_worker_loop())
+
+def preload_genai():
+    try:
+        get_genai()
+    except Exception as e:
+        print(f"Failed to preload the Gemini SDK: {str(e)}")
+
+@app.on_event("startup")
+async def warm_llm_client():
+    """Optionally import the Gemini SDK in the background after startup.
+
+    Off by default: the first LLM call imports it instead, so workers that only
+    serve CLI generations never pay for grpc and protobuf.
+    """
+    if PRELOAD_LLM and llm_client_status()["available"]:
+        asyncio.get_running_loop().run_in_executor(None, preload_genai)
+
+@app.on_event("shutdown")
+async def drain_generation_jobs():
+    """Stop claiming new jobs and wait for in-flight generations to finish.
+
+    Running scaffolds are not interrupted, so the drain lasts as long as the
+    slowest job; their leases keep being renewed until they record a result.
+    """
+    stop_claiming.set()
+    if job_loop_task is not None:
+        try:
+            await job_loop_task
+        except Exception as e:
+            print(f"Job worker loop failed: {str(e)}")
+    if in_flight_jobs:
+        print(f"Draining {len(in_flight_jobs)} in-flight generation job(s)...")
+        await asyncio.wait(list(in_flight_jobs.values()))
+
+@app.post("/api/jobs/generate_full", response_model=GenerationJobResponse, status_code=202)
+def enqueue_full_project(request: GenerateFullProjectRequest = Body(...)):
+    """Queue a full project generation to be executed by any available worker"""
+    job_id = get_state().create_job("generate_full", request.dict())
+    return GenerationJobResponse(job_id=job_id, status="queued")
+
+@app.get("/api/jobs/{job_id}", response_model=GenerationJobResponse)
+def get_generation_job(job_id: str):
+    job = get_state().get_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job {job_id} not found")
+    return GenerationJobResponse(
+        job_id=job["id"],
+        status=job["status"],
+        result=job["result"],
+        error=job["error"]
+    )
+
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8000) 
\ No newline at end of file
+    # Workers share job state, the LLM cache and scaffold locks through the state backend,
+    # so several of them can serve the same Projects/ directory
+    uvicorn.run(
+        "main:app",
+        app_dir=str(Path(__file__).resolve().parent),
+        host="0.0.0.0",
+        port=8000,
+        workers=int(os.getenv("SHIPWRIGHT_WORKERS", "1")),
+        timeout_graceful_shutdown=int(DRAIN_TIMEOUT) if DRAIN_TIMEOUT else None
+    ) 
\ No newline at end of file
@@ -0,0 +1,62 @@
+"""Report what importing the API costs at startup.
+
+Runs `python -X importtime -c "import main"` in a fresh interpreter and prints
+the slowest modules by cumulative import time, so regressions in cold start
+(e.g. the Gemini SDK being imported eagerly again) are easy to spot.
+
+Usage:
+    python profile_imports.py [--top N] [--module main]
+"""
+import argparse
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+
+def profile_imports(module: str):
+    """Return the wall time and (cumulative_us, self_us, name) rows for importing `module`"""
+    started = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=Path(__file__).resolve().parent,
+        capture_output=True,
+        text=True
+    )
+    elapsed = time.perf_counter() - started
+    if result.returncode != 0:
+        raise SystemExit(f"Importing {module} failed:\n{result.stderr}")
+
+    rows = []
+    for line in result.stderr.splitlines():
+        # Format: "import time: self [us] | cumulative | imported package"
+        if not line.startswith("import time:") or "imported package" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|", 2)
+        rows.append((int(cumulative_us), int(self_us), name.rstrip()))
+    return elapsed, rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Profile import time of the Shipwright AI API")
+    parser.add_argument("--top", type=int, default=25, help="Number of modules to show")
+    parser.add_argument("--module", default="main", help="Module to import")
+    args = parser.parse_args()
+
+    elapsed, rows = profile_imports(args.module)
+    total_us = next((cumulative for cumulative, _, name in rows if name.strip() == args.module), 0)
+
+    print(f"Interpreter start + import {args.module}: {elapsed * 1000:.1f} ms")
+    print(f"Import of {args.module} (cumulative): {total_us / 1000:.1f} ms")
+    print()
+    print(f"{'cumulative ms':>14} {'self ms':>9}  module")
+    for cumulative_us, self_us, name in sorted(rows, reverse=True)[:args.top]:
+        print(f"{cumulative_us / 1000:>14.1f} {self_us / 1000:>9.1f}  {name}")
+
+    if any(name.strip().startswith("google.generativeai") for _, _, name in rows):
+        print()
+        print("Warning: the Gemini SDK is imported at startup; it should only load on first LLM call")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,534 @@
+"""Shared state for running the API across several workers.
+
+Job state, the LLM response cache and scaffold locks live here instead of in
+process memory, so any worker can accept a request and any worker can execute
+it. SQLite is the default backend and covers workers on a single host; set
+SHIPWRIGHT_STATE_BACKEND=redis to spread workers across hosts.
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Iterator, Optional
+
+
+DEFAULT_JOB_RETENTION = 7 * 24 * 3600
+
+
+class LockTimeout(Exception):
+    """Raised when a shared lock could not be acquired in time"""
+
+
+class LockLost(Exception):
+    """Raised when a held lock expired and another worker may have taken it"""
+
+
+class HeldLock:
+    """Handle yielded by `StateBackend.lock`; check it before writing under the lock"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self._lost = threading.Event()
+
+    @property
+    def lost(self) -> bool:
+        return self._lost.is_set()
+
+    def mark_lost(self) -> None:
+        self._lost.set()
+
+    def ensure_held(self) -> None:
+        if self.lost:
+            raise LockLost(f"Lost lock '{self.name}'; another worker may be using it")
+
+
+class StateBackend(ABC):
+    """Interface shared by every state backend.
+
+    Running jobs hold a lease: the executing worker renews it with
+    `heartbeat_job`, and `claim_job` hands out queued jobs as well as running
+    jobs whose lease has lapsed, so work left behind by a dead worker is picked
+    up again.
+    """
+
+    @abstractmethod
+    def create_job(self, kind: str, payload: Dict[str, Any]) -> str:
+        """Queue a job and return its id"""
+
+    @abstractmethod
+    def get_job(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Return the job as a dict, or None if it does not exist"""
+
+    @abstractmethod
+    def claim_job(self, worker_id: str, lease: float) -> Optional[Dict[str, Any]]:
+        """Atomically take the oldest claimable job and mark it as running for `worker_id`"""
+
+    @abstractmethod
+    def heartbeat_job(self, job_id: str, worker_id: str) -> bool:
+        """Renew the lease on a running job; False if the job is no longer ours"""
+
+    @abstractmethod
+    def finish_job(self, job_id: str, worker_id: str, result: Optional[Dict[str, Any]] = None, error: Optional[str] = None) -> None:
+        """Record the outcome, unless the job was requeued or reclaimed away from this worker"""
+
+    @abstractmethod
+    def requeue_job(self, job_id: str) -> None:
+        """Put a running job back on the queue"""
+
+    @abstractmethod
+    def cache_get(self, key: str) -> Optional[str]:
+        """Return a cached value, or None if missing or expired"""
+
+    @abstractmethod
+    def cache_set(self, key: str, value: str, ttl: int) -> None:
+        """Cache a value for `ttl` seconds"""
+
+    @abstractmethod
+    def acquire_lock(self, name: str, owner: str, ttl: float) -> bool:
+        """Take the lock if it is free or expired"""
+
+    @abstractmethod
+    def extend_lock(self, name: str, owner: str, ttl: float) -> bool:
+        """Push back the expiry of a lock still held by `owner`"""
+
+    @abstractmethod
+    def release_lock(self, name: str, owner: str) -> None:
+        """Release the lock if it is still held by `owner`"""
+
+    @abstractmethod
+    def ping(self) -> bool:
+        """Return True if the backend is reachable"""
+
+    @contextmanager
+    def lock(self, name: str, timeout: float = 600, ttl: float = 60, poll_interval: float = 0.5) -> Iterator[HeldLock]:
+        """Hold a named lock shared by all workers, waiting up to `timeout` seconds.
+
+        The lock is renewed in the background while held, so `ttl` only bounds
+        how long a crashed worker can keep it. If a renewal finds the lock gone,
+        the yielded handle is marked as lost.
+        """
+        owner = uuid.uuid4().hex
+        deadline = time.monotonic() + timeout
+        while not self.acquire_lock(name, owner, ttl):
+            if time.monotonic() >= deadline:
+                raise LockTimeout(f"Timed out waiting for lock '{name}'")
+            time.sleep(poll_interval)
+
+        held = HeldLock(name)
+        released = threading.Event()
+
+        def keep_alive():
+            while not released.wait(ttl / 3):
+                try:
+                    if not self.extend_lock(name, owner, ttl):
+                        print(f"Lost lock '{name}'; another worker may now hold it")
+                        held.mark_lost()
+                        return
+                except Exception as e:
+                    print(f"Failed to renew lock '{name}': {str(e)}")
+
+        renewer = threading.Thread(target=keep_alive, daemon=True)
+        renewer.start()
+        try:
+            yield held
+        finally:
+            released.set()
+            renewer.join()
+            self.release_lock(name, owner)
+
+
+def _job_from_row(row: sqlite3.Row) -> Dict[str, Any]:
+    return {
+        "id": row["id"],
+        "kind": row["kind"],
+        "status": row["status"],
+        "payload": json.loads(row["payload"]),
+        "result": json.loads(row["result"]) if row["result"] else None,
+        "error": row["error"],
+        "worker": row["worker"],
+        "created_at": row["created_at"],
+        "updated_at": row["updated_at"],
+    }
+
+
+class SQLiteStateBackend(StateBackend):
+    """State kept in a single SQLite file, shared by every worker on one host.
+
+    The database runs in WAL mode, which relies on shared memory and does not
+    work over network filesystems; use the Redis backend for multiple hosts.
+    """
+
+    def __init__(self, path: Path, job_retention: float = DEFAULT_JOB_RETENTION):
+        self.path = Path(path)
+        self.job_retention = job_retention
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript("""
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id TEXT PRIMARY KEY,
+                    kind TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    payload TEXT NOT NULL,
+                    result TEXT,
+                    error TEXT,
+                    worker TEXT,
+                    created_at REAL NOT NULL,
+                    updated_at REAL NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS jobs_status_created ON jobs (status, created_at);
+                CREATE TABLE IF NOT EXISTS llm_cache (
+                    key TEXT PRIMARY KEY,
+                    value TEXT NOT NULL,
+                    expires_at REAL NOT NULL
+                );
+                CREATE TABLE IF NOT EXISTS locks (
+                    name TEXT PRIMARY KEY,
+                    owner TEXT NOT NULL,
+                    expires_at REAL NOT NULL
+                );
+            """)
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        # A fresh connection per call keeps this safe to use from the event loop and executor threads
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    @contextmanager
+    def _transaction(self) -> Iterator[sqlite3.Connection]:
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield conn
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+            conn.execute("COMMIT")
+
+    def create_job(self, kind: str, payload: Dict[str, Any]) -> str:
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT INTO jobs (id, kind, status, payload, created_at, updated_at) VALUES (?, ?, 'queued', ?, ?, ?)",
+                (job_id, kind, json.dumps(payload), now, now),
+            )
+        return job_id
+
+    def get_job(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self._connect() as conn:
+            row = conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return _job_from_row(row) if row else None
+
+    def claim_job(self, worker_id: str, lease: float) -> Optional[Dict[str, Any]]:
+        now = time.time()
+        with self._transaction() as conn:
+            row = conn.execute(
+                "SELECT * FROM jobs WHERE status = 'queued' OR (status = 'running' AND updated_at < ?) "
+                "ORDER BY created_at LIMIT 1",
+                (now - lease,),
+            ).fetchone()
+            if row is None:
+                return None
+            conn.execute(
+                "UPDATE jobs SET status = 'running', worker = ?, updated_at = ? WHERE id = ?",
+                (worker_id, now, row["id"]),
+            )
+        job = _job_from_row(row)
+        job.update(status="running", worker=worker_id, updated_at=now)
+        return job
+
+    def heartbeat_job(self, job_id: str, worker_id: str) -> bool:
+        with self._connect() as conn:
+            cursor = conn.execute(
+                "UPDATE jobs SET updated_at = ? WHERE id = ? AND worker = ? AND status = 'running'",
+                (time.time(), job_id, worker_id),
+            )
+        return cursor.rowcount == 1
+
+    def finish_job(self, job_id: str, worker_id: str, result: Optional[Dict[str, Any]] = None, error: Optional[str] = None) -> None:
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE jobs SET status = ?, result = ?, error = ?, updated_at = ? "
+                "WHERE id = ? AND worker = ? AND status = 'running'",
+                (
+                    "failed" if error is not None else "succeeded",
+                    json.dumps(result) if result is not None else None,
+                    error,
+                    time.time(),
+                    job_id,
+                    worker_id,
+                ),
+            )
+            # Finished jobs are kept for `job_retention` seconds so clients can still poll them
+            conn.execute(
+                "DELETE FROM jobs WHERE status IN ('succeeded', 'failed') AND updated_at < ?",
+                (time.time() - self.job_retention,),
+            )
+
+    def requeue_job(self, job_id: str) -> None:
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE jobs SET status = 'queued', worker = NULL, updated_at = ? WHERE id = ? AND status = 'running'",
+                (time.time(), job_id),
+            )
+
+    def cache_get(self, key: str) -> Optional[str]:
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT value FROM llm_cache WHERE key = ? AND expires_at > ?", (key, time.time())
+            ).fetchone()
+        return row["value"] if row else None
+
+    def cache_set(self, key: str, value: str, ttl: int) -> None:
+        with self._connect() as conn:
+            conn.execute("DELETE FROM llm_cache WHERE expires_at <= ?", (time.time(),))
+            conn.execute(
+                "INSERT OR REPLACE INTO llm_cache (key, value, expires_at) VALUES (?, ?, ?)",
+                (key, value, time.time() + ttl),
+            )
+
+    def acquire_lock(self, name: str, owner: str, ttl: float) -> bool:
+        now = time.time()
+        with self._transaction() as conn:
+            # Locks left behind by a crashed worker expire instead of blocking forever
+            conn.execute("DELETE FROM locks WHERE name = ? AND expires_at <= ?", (name, now))
+            cursor = conn.execute(
+                "INSERT OR IGNORE INTO locks (name, owner, expires_at) VALUES (?, ?, ?)",
+                (name, owner, now + ttl),
+            )
+            return cursor.rowcount == 1
+
+    def extend_lock(self, name: str, owner: str, ttl: float) -> bool:
+        now = time.time()
+        with self._connect() as conn:
+            cursor = conn.execute(
+                "UPDATE locks SET expires_at = ? WHERE name = ? AND owner = ? AND expires_at > ?",
+                (now + ttl, name, owner, now),
+            )
+        return cursor.rowcount == 1
+
+    def release_lock(self, name: str, owner: str) -> None:
+        with self._connect() as conn:
+            conn.execute("DELETE FROM locks WHERE name = ? AND owner = ?", (name, owner))
+
+    def ping(self) -> bool:
+        try:
+            with self._connect() as conn:
+                conn.execute("SELECT 1")
+            return True
+        except sqlite3.Error:
+            return False
+
+
+class RedisStateBackend(StateBackend):
+    """State kept in a Redis-compatible server, for workers spread across hosts.
+
+    Claimed job ids are moved atomically from the queue to a processing list
+    with LMOVE, and every read-then-write on a job or lock runs in a
+    WATCH/MULTI transaction. Any client exposing the redis-py interface (such
+    as fakeredis) can be passed in as `client`.
+    """
+
+    def __init__(self, client: Any = None, url: Optional[str] = None, prefix: str = "shipwright", job_retention: float = DEFAULT_JOB_RETENTION):
+        if client is None:
+            import redis
+            client = redis.Redis.from_url(url or "redis://localhost:6379/0")
+        self.client = client
+        self.prefix = prefix
+        self.job_retention = job_retention
+        self.queue_key = self._key("jobs", "queue")
+        self.processing_key = self._key("jobs", "processing")
+
+    def _key(self, *parts: str) -> str:
+        return ":".join((self.prefix,) + parts)
+
+    @staticmethod
+    def _decode(value: Any) -> Any:
+        return value.decode() if isinstance(value, bytes) else value
+
+    def _fields(self, raw: Dict[Any, Any]) -> Dict[str, str]:
+        return {self._decode(k): self._decode(v) for k, v in raw.items()}
+
+    def _transaction(self, func, *keys: str) -> Any:
+        # Retries `func` until none of the watched keys changed under it
+        return self.client.transaction(func, *keys, value_from_callable=True)
+
+    def create_job(self, kind: str, payload: Dict[str, Any]) -> str:
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        pipe = self.client.pipeline(transaction=True)
+        pipe.hset(self._key("job", job_id), mapping={
+            "id": job_id,
+            "kind": kind,
+            "status": "queued",
+            "payload": json.dumps(payload),
+            "result": "",
+            "error": "",
+            "worker": "",
+            "created_at": now,
+            "updated_at": now,
+        })
+        pipe.rpush(self.queue_key, job_id)
+        pipe.execute()
+        return job_id
+
+    def get_job(self, job_id: str) -> Optional[Dict[str, Any]]:
+        fields = self._fields(self.client.hgetall(self._key("job", job_id)))
+        if not fields:
+            return None
+        return {
+            "id": fields["id"],
+            "kind": fields["kind"],
+            "status": fields["status"],
+            "payload": json.loads(fields["payload"]),
+            "result": json.loads(fields["result"]) if fields.get("result") else None,
+            "error": fields.get("error") or None,
+            "worker": fields.get("worker") or None,
+            "created_at": float(fields["created_at"]),
+            "updated_at": float(fields["updated_at"]),
+        }
+
+    def _take_job(self, job_id: str, worker_id: str, lease: float, stale_only: bool) -> Optional[Dict[str, Any]]:
+        """Mark a job in the processing list as running for `worker_id`, if it is claimable"""
+        job_key = self._key("job", job_id)
+
+        def take(pipe) -> bool:
+            fields = self._fields(pipe.hgetall(job_key))
+            if not fields:
+                pipe.multi()
+                pipe.lrem(self.processing_key, 0, job_id)
+                return False
+            expired = float(fields["updated_at"]) < time.time() - lease
+            # A queued job in the processing list was moved there by a worker that has not
+            # marked it running yet; only take it over once that has clearly stalled
+            claimable = (fields["status"] == "queued" and (expired or not stale_only)) or \
+                (fields["status"] == "running" and expired)
+            if not claimable:
+                return False
+            pipe.multi()
+            pipe.hset(job_key, mapping={"status": "running", "worker": worker_id, "updated_at": time.time()})
+            return True
+
+        return self.get_job(job_id) if self._transaction(take, job_key) else None
+
+    def claim_job(self, worker_id: str, lease: float) -> Optional[Dict[str, Any]]:
+        # Jobs whose worker died stay in the processing list with a lapsed lease
+        for raw_id in self.client.lrange(self.processing_key, 0, -1):
+            job = self._take_job(self._decode(raw_id), worker_id, lease, stale_only=True)
+            if job is not None:
+                return job
+        # LMOVE is atomic, so each queued job id is handed to exactly one worker and is
+        # never dropped: if this worker dies now, the id is recovered from the processing list
+        job_id = self._decode(self.client.lmove(self.queue_key, self.processing_key, "LEFT", "RIGHT"))
+        if job_id is None:
+            return None
+        return self._take_job(job_id, worker_id, lease, stale_only=False)
+
+    def heartbeat_job(self, job_id: str, worker_id: str) -> bool:
+        job_key = self._key("job", job_id)
+
+        def renew(pipe) -> bool:
+            fields = self._fields(pipe.hgetall(job_key))
+            if fields.get("status") != "running" or fields.get("worker") != worker_id:
+                return False
+            pipe.multi()
+            pipe.hset(job_key, "updated_at", time.time())
+            return True
+
+        return self._transaction(renew, job_key)
+
+    def finish_job(self, job_id: str, worker_id: str, result: Optional[Dict[str, Any]] = None, error: Optional[str] = None) -> None:
+        job_key = self._key("job", job_id)
+
+        def finish(pipe) -> None:
+            fields = self._fields(pipe.hgetall(job_key))
+            if fields.get("status") != "running" or fields.get("worker") != worker_id:
+                return
+            pipe.multi()
+            pipe.hset(job_key, mapping={
+                "status": "failed" if error is not None else "succeeded",
+                "result": json.dumps(result) if result is not None else "",
+                "error": error or "",
+                "updated_at": time.time(),
+            })
+            pipe.lrem(self.processing_key, 0, job_id)
+            pipe.pexpire(job_key, int(self.job_retention * 1000))
+
+        self._transaction(finish, job_key)
+
+    def requeue_job(self, job_id: str) -> None:
+        job_key = self._key("job", job_id)
+
+        def requeue(pipe) -> None:
+            fields = self._fields(pipe.hgetall(job_key))
+            if fields.get("status") != "running":
+                return
+            pipe.multi()
+            pipe.hset(job_key, mapping={"status": "queued", "worker": "", "updated_at": time.time()})
+            pipe.lrem(self.processing_key, 0, job_id)
+            pipe.rpush(self.queue_key, job_id)
+
+        self._transaction(requeue, job_key)
+
+    def cache_get(self, key: str) -> Optional[str]:
+        return self._decode(self.client.get(self._key("cache", key)))
+
+    def cache_set(self, key: str, value: str, ttl: int) -> None:
+        self.client.set(self._key("cache", key), value, ex=ttl)
+
+    def acquire_lock(self, name: str, owner: str, ttl: float) -> bool:
+        return bool(self.client.set(self._key("lock", name), owner, nx=True, px=int(ttl * 1000)))
+
+    def extend_lock(self, name: str, owner: str, ttl: float) -> bool:
+        lock_key = self._key("lock", name)
+
+        def extend(pipe) -> bool:
+            if self._decode(pipe.get(lock_key)) != owner:
+                return False
+            pipe.multi()
+            pipe.pexpire(lock_key, int(ttl * 1000))
+            return True
+
+        return self._transaction(extend, lock_key)
+
+    def release_lock(self, name: str, owner: str) -> None:
+        lock_key = self._key("lock", name)
+
+        def release(pipe) -> None:
+            if self._decode(pipe.get(lock_key)) != owner:
+                return
+            pipe.multi()
+            pipe.delete(lock_key)
+
+        self._transaction(release, lock_key)
+
+    def ping(self) -> bool:
+        try:
+            return bool(self.client.ping())
+        except Exception:
+            return False
+
+
+def get_state_backend(default_dir: Path) -> StateBackend:
+    """Build the backend selected by SHIPWRIGHT_STATE_BACKEND (sqlite or redis)"""
+    backend = os.getenv("SHIPWRIGHT_STATE_BACKEND", "sqlite").lower()
+    job_retention = float(os.getenv("SHIPWRIGHT_JOB_RETENTION", DEFAULT_JOB_RETENTION))
+    if backend == "redis":
+        return RedisStateBackend(url=os.getenv("SHIPWRIGHT_REDIS_URL"), job_retention=job_retention)
+    if backend == "sqlite":
+        return SQLiteStateBackend(
+            Path(os.getenv("SHIPWRIGHT_STATE_DB", default_dir / ".shipwright_state.db")),
+            job_retention=job_retention,
+        )
+    raise ValueError(f"Unknown SHIPWRIGHT_STATE_BACKEND '{backend}', expected 'sqlite' or 'redis'")
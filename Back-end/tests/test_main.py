@@ -0,0 +1,177 @@
+import asyncio
+import json
+import threading
+import time
+from contextlib import asynccontextmanager
+
+import httpx
+import pytest
+from fastapi import HTTPException
+
+import main
+from shared_state import SQLiteStateBackend
+
+
+class FakeModel:
+    def __init__(self, responses):
+        self.responses = responses
+        self.calls = 0
+
+    def generate_content(self, prompt):
+        text = self.responses[min(self.calls, len(self.responses) - 1)]
+        self.calls += 1
+        return type("Response", (), {"text": text})()
+
+
+@pytest.fixture
+def state(tmp_path, monkeypatch):
+    backend = SQLiteStateBackend(tmp_path / "state.db")
+    monkeypatch.setattr(main, "_state", backend)
+    monkeypatch.setattr(main, "JOB_POLL_INTERVAL", 0.02)
+    return backend
+
+
+@pytest.fixture
+def fake_model(monkeypatch):
+    model = FakeModel(["not json", '{"ok": true}'])
+    genai = type("FakeGenai", (), {"GenerativeModel": staticmethod(lambda name: model)})
+    monkeypatch.setattr(main, "get_genai", lambda: genai)
+    return model
+
+
+@asynccontextmanager
+async def running_app():
+    await main.app.router.startup()
+    try:
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            yield client
+    finally:
+        await main.app.router.shutdown()
+
+
+async def wait_for_status(client, job_id, statuses, timeout=5):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        job = (await client.get(f"/api/jobs/{job_id}")).json()
+        if job["status"] in statuses:
+            return job
+        await asyncio.sleep(0.02)
+    raise AssertionError(f"Job {job_id} never reached {statuses}")
+
+
+def test_llm_response_cached_only_after_parse_succeeds(state, fake_model):
+    with pytest.raises(json.JSONDecodeError):
+        main.generate_llm_text("prompt", parse=json.loads)
+
+    assert main.generate_llm_text("prompt", parse=json.loads) == '{"ok": true}'
+    assert main.generate_llm_text("prompt", parse=json.loads) == '{"ok": true}'
+    assert fake_model.calls == 2
+
+
+def test_scaffold_lock_timeout_is_409(state, monkeypatch):
+    monkeypatch.setattr(main, "SCAFFOLD_LOCK_TIMEOUT", 0.05)
+    assert state.acquire_lock("scaffold:backend:demo", "other-worker", ttl=60)
+
+    with pytest.raises(HTTPException) as exc_info:
+        with main.scaffold_lock("backend:demo"):
+            pass
+    assert exc_info.value.status_code == 409
+
+
+def test_queued_jobs_succeed_and_fail_through_worker_loop(state, monkeypatch):
+    def fake_generate_full_project(request):
+        if request.name == "broken":
+            raise ValueError("scaffold failed")
+        return main.GenerateFullProjectResponse(message=f"generated {request.name}")
+
+    monkeypatch.setattr(main, "generate_full_project", fake_generate_full_project)
+
+    async def scenario():
+        async with running_app() as client:
+            response = await client.post("/api/jobs/generate_full", json={"name": "demo", "tech_stack": {}})
+            assert response.status_code == 202
+            ok = await wait_for_status(client, response.json()["job_id"], {"succeeded", "failed"})
+
+            response = await client.post("/api/jobs/generate_full", json={"name": "broken", "tech_stack": {}})
+            failed = await wait_for_status(client, response.json()["job_id"], {"succeeded", "failed"})
+
+            missing = await client.get("/api/jobs/unknown")
+        return ok, failed, missing
+
+    ok, failed, missing = asyncio.run(scenario())
+    assert ok["status"] == "succeeded"
+    assert ok["result"]["message"] == "generated demo"
+    assert failed["status"] == "failed"
+    assert failed["error"] == "scaffold failed"
+    assert missing.status_code == 404
+
+
+def test_shutdown_waits_for_in_flight_jobs(state, monkeypatch):
+    release = threading.Event()
+
+    def slow_generate_full_project(request):
+        release.wait(5)
+        return main.GenerateFullProjectResponse(message="done")
+
+    monkeypatch.setattr(main, "generate_full_project", slow_generate_full_project)
+
+    async def scenario():
+        async with running_app() as client:
+            response = await client.post("/api/jobs/generate_full", json={"name": "demo", "tech_stack": {}})
+            job_id = response.json()["job_id"]
+            await wait_for_status(client, job_id, {"running"})
+            # Let the job finish only after shutdown has started draining
+            asyncio.get_running_loop().call_later(0.2, release.set)
+        return job_id
+
+    job_id = asyncio.run(scenario())
+    assert state.get_job(job_id)["status"] == "succeeded"
+
+
+def test_job_claimed_during_shutdown_is_requeued(state, monkeypatch):
+    job_id = state.create_job("generate_full", {"name": "demo", "tech_stack": {}})
+    claim_job = state.claim_job
+
+    def claim_then_shut_down(worker_id, lease):
+        job = claim_job(worker_id, lease)
+        main.stop_claiming.set()
+        return job
+
+    monkeypatch.setattr(state, "claim_job", claim_then_shut_down)
+
+    async def scenario():
+        monkeypatch.setattr(main, "stop_claiming", asyncio.Event())
+        await main.job_worker_loop()
+
+    asyncio.run(scenario())
+    assert state.get_job(job_id)["status"] == "queued"
+    assert not main.in_flight_jobs
+
+
+def test_drain_survives_failed_requeue(state, monkeypatch):
+    release = threading.Event()
+    finished = []
+
+    def requeue_fails(job_id):
+        raise ConnectionError("state backend down")
+
+    monkeypatch.setattr(state, "requeue_job", requeue_fails)
+
+    async def scenario():
+        loop = asyncio.get_running_loop()
+        monkeypatch.setattr(main, "stop_claiming", asyncio.Event())
+        future = loop.run_in_executor(None, lambda: finished.append(release.wait(5)))
+        monkeypatch.setitem(main.in_flight_jobs, "in-flight", future)
+        future.add_done_callback(lambda _: main.in_flight_jobs.pop("in-flight", None))
+
+        async def failing_loop():
+            raise ConnectionError("state backend down")
+
+        monkeypatch.setattr(main, "job_loop_task", asyncio.create_task(failing_loop()))
+        loop.call_later(0.1, release.set)
+        await main.drain_generation_jobs()
+        return future.done()
+
+    assert asyncio.run(scenario())
+    assert finished == [True]
@@ -0,0 +1,185 @@
+import threading
+import time
+
+import pytest
+
+from shared_state import LockLost, LockTimeout, RedisStateBackend, SQLiteStateBackend
+
+
+@pytest.fixture(params=["sqlite", "redis"])
+def make_state(request, tmp_path):
+    def make(**kwargs):
+        if request.param == "sqlite":
+            return SQLiteStateBackend(tmp_path / "state.db", **kwargs)
+        fakeredis = pytest.importorskip("fakeredis")
+        return RedisStateBackend(client=fakeredis.FakeRedis(), **kwargs)
+    return make
+
+
+@pytest.fixture
+def state(make_state):
+    return make_state()
+
+
+def test_each_job_is_claimed_exactly_once(state):
+    job_ids = {state.create_job("generate_full", {"n": n}) for n in range(20)}
+    claimed = []
+    claimed_lock = threading.Lock()
+
+    def worker(worker_id):
+        while True:
+            job = state.claim_job(worker_id, lease=60)
+            if job is None:
+                return
+            with claimed_lock:
+                claimed.append(job["id"])
+
+    threads = [threading.Thread(target=worker, args=(f"w{n}",)) for n in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert sorted(claimed) == sorted(job_ids)
+
+
+def test_claimed_job_is_running_for_worker(state):
+    job_id = state.create_job("generate_full", {"name": "demo"})
+    job = state.claim_job("w1", lease=60)
+
+    assert job["id"] == job_id
+    assert job["payload"] == {"name": "demo"}
+    assert state.get_job(job_id)["status"] == "running"
+    assert state.get_job(job_id)["worker"] == "w1"
+    assert state.claim_job("w2", lease=60) is None
+
+
+def test_finish_job_records_result(state):
+    job_id = state.create_job("generate_full", {})
+    state.claim_job("w1", lease=60)
+    state.finish_job(job_id, "w1", result={"message": "done"})
+
+    job = state.get_job(job_id)
+    assert job["status"] == "succeeded"
+    assert job["result"] == {"message": "done"}
+    assert state.claim_job("w2", lease=0) is None
+
+
+def test_late_finish_is_discarded_after_requeue(state):
+    job_id = state.create_job("generate_full", {})
+    state.claim_job("w1", lease=60)
+    state.requeue_job(job_id)
+    assert state.get_job(job_id)["status"] == "queued"
+
+    assert state.claim_job("w2", lease=60)["id"] == job_id
+    state.finish_job(job_id, "w1", error="too late")
+    assert state.get_job(job_id)["status"] == "running"
+
+    state.finish_job(job_id, "w2", result={"message": "done"})
+    assert state.get_job(job_id)["status"] == "succeeded"
+
+
+def test_expired_lease_is_reclaimed(state):
+    job_id = state.create_job("generate_full", {})
+    state.claim_job("w1", lease=60)
+    assert state.claim_job("w2", lease=60) is None
+
+    time.sleep(0.05)
+    assert state.claim_job("w2", lease=0.01)["id"] == job_id
+    assert not state.heartbeat_job(job_id, "w1")
+    assert state.heartbeat_job(job_id, "w2")
+
+    state.finish_job(job_id, "w1", result={"message": "stale"})
+    assert state.get_job(job_id)["worker"] == "w2"
+
+
+def test_heartbeat_keeps_lease_alive(state):
+    job_id = state.create_job("generate_full", {})
+    state.claim_job("w1", lease=60)
+    time.sleep(0.05)
+    assert state.heartbeat_job(job_id, "w1")
+
+    assert state.claim_job("w2", lease=0.04) is None
+
+
+def test_redis_recovers_job_moved_by_crashed_worker():
+    fakeredis = pytest.importorskip("fakeredis")
+    state = RedisStateBackend(client=fakeredis.FakeRedis())
+    job_id = state.create_job("generate_full", {})
+    # Simulate a worker dying between LMOVE and marking the job as running
+    state.client.lmove(state.queue_key, state.processing_key, "LEFT", "RIGHT")
+    assert state.get_job(job_id)["status"] == "queued"
+
+    assert state.claim_job("w2", lease=60) is None
+    time.sleep(0.05)
+    assert state.claim_job("w2", lease=0.01)["id"] == job_id
+
+
+def test_finished_jobs_expire_after_retention(make_state):
+    state = make_state(job_retention=0.2)
+    old_id = state.create_job("generate_full", {})
+    state.claim_job("w1", lease=60)
+    state.finish_job(old_id, "w1", result={})
+    time.sleep(0.3)
+
+    new_id = state.create_job("generate_full", {})
+    state.claim_job("w1", lease=60)
+    state.finish_job(new_id, "w1", result={})
+
+    assert state.get_job(old_id) is None
+    assert state.get_job(new_id)["status"] == "succeeded"
+
+
+def test_expired_cache_rows_are_pruned(tmp_path):
+    state = SQLiteStateBackend(tmp_path / "state.db")
+    state.cache_set("old", "value", ttl=0)
+    state.cache_set("new", "value", ttl=60)
+
+    with state._connect() as conn:
+        keys = [row["key"] for row in conn.execute("SELECT key FROM llm_cache")]
+    assert keys == ["new"]
+
+
+def test_cache_round_trip(state):
+    assert state.cache_get("missing") is None
+    state.cache_set("key", "value", ttl=60)
+    assert state.cache_get("key") == "value"
+
+
+def test_lock_expires(state):
+    assert state.acquire_lock("scaffold:demo", "a", ttl=0.05)
+    assert not state.acquire_lock("scaffold:demo", "b", ttl=0.05)
+    time.sleep(0.1)
+    assert state.acquire_lock("scaffold:demo", "b", ttl=60)
+
+
+def test_release_only_by_owner(state):
+    assert state.acquire_lock("scaffold:demo", "a", ttl=60)
+    state.release_lock("scaffold:demo", "b")
+    assert not state.acquire_lock("scaffold:demo", "b", ttl=60)
+    state.release_lock("scaffold:demo", "a")
+    assert state.acquire_lock("scaffold:demo", "b", ttl=60)
+
+
+def test_held_lock_is_renewed(state):
+    with state.lock("scaffold:demo", ttl=0.1):
+        time.sleep(0.3)
+        assert not state.acquire_lock("scaffold:demo", "other", ttl=60)
+    assert state.acquire_lock("scaffold:demo", "other", ttl=60)
+
+
+def test_lock_timeout(state):
+    assert state.acquire_lock("scaffold:demo", "a", ttl=60)
+    with pytest.raises(LockTimeout):
+        with state.lock("scaffold:demo", timeout=0.1, poll_interval=0.02):
+            pass
+
+
+def test_lost_lock_is_flagged(state, monkeypatch):
+    monkeypatch.setattr(state, "extend_lock", lambda name, owner, ttl: False)
+    with state.lock("scaffold:demo", ttl=0.06) as held:
+        assert not held.lost
+        time.sleep(0.1)
+        assert held.lost
+        with pytest.raises(LockLost):
+            held.ensure_held()
@@ -0,0 +1,118 @@
+import asyncio
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+import httpx
+import pytest
+
+import main
+from shared_state import SQLiteStateBackend
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+TOOLCHAINS = {"npx": True, "npm": True, "dotnet": False, "python3_venv": True}
+
+
+def run_python(code, tmp_path, extra_path=None):
+    env = dict(os.environ, GOOGLE_API_KEY="test-key", SHIPWRIGHT_STATE_DB=str(tmp_path / "state.db"))
+    if extra_path:
+        env["PYTHONPATH"] = os.pathsep.join(filter(None, [str(extra_path), env.get("PYTHONPATH")]))
+    result = subprocess.run(
+        [sys.executable, "-c", code], cwd=BACKEND_DIR, env=env, capture_output=True, text=True
+    )
+    assert result.returncode == 0, result.stderr
+    return result.stdout.strip()
+
+
+@pytest.fixture
+def fake_sdk_path(tmp_path):
+    # Stand-in for google.generativeai, used when the real SDK is not installed
+    package = tmp_path / "fake_sdk" / "google" / "generativeai"
+    package.mkdir(parents=True)
+    (package / "__init__.py").write_text("def configure(**kwargs):\n    pass\n")
+    return tmp_path / "fake_sdk"
+
+
+def test_import_does_not_load_gemini_sdk_or_state(tmp_path, fake_sdk_path):
+    loaded = run_python(
+        "import sys, main; print(sorted(m for m in sys.modules if m.startswith(('google.generativeai', 'grpc'))))",
+        tmp_path,
+        extra_path=fake_sdk_path,
+    )
+    assert loaded == "[]"
+    assert not (tmp_path / "state.db").exists()
+
+
+def test_first_llm_use_loads_gemini_sdk(tmp_path, fake_sdk_path):
+    loaded = run_python(
+        "import sys, main; main.get_genai(); print('google.generativeai' in sys.modules)",
+        tmp_path,
+        extra_path=fake_sdk_path,
+    )
+    assert loaded == "True"
+
+
+@pytest.fixture
+def toolchain_probes(monkeypatch):
+    probes = []
+
+    def probe():
+        probes.append(1)
+        return dict(TOOLCHAINS)
+
+    monkeypatch.setattr(main, "probe_toolchains", probe)
+    monkeypatch.setattr(main, "_toolchains", None)
+    return probes
+
+
+def get_ready():
+    async def request():
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return await client.get("/ready")
+    return asyncio.run(request())
+
+
+def test_ready_reports_llm_and_toolchains(tmp_path, monkeypatch, toolchain_probes):
+    monkeypatch.setattr(main, "_state", SQLiteStateBackend(tmp_path / "state.db"))
+    monkeypatch.setattr(main, "_genai", None)
+    monkeypatch.setenv("GOOGLE_API_KEY", "test-key")
+
+    response = get_ready()
+
+    assert response.status_code == 200
+    body = response.json()
+    assert body["status"] == "ready"
+    assert body["state_backend"] is True
+    assert body["toolchains"] == TOOLCHAINS
+    assert body["llm"]["api_key_configured"] is True
+    assert body["llm"]["loaded"] is False
+    assert body["llm"]["available"] == body["llm"]["sdk_installed"]
+
+
+def test_ready_is_503_when_state_backend_is_down(tmp_path, monkeypatch, toolchain_probes):
+    backend = SQLiteStateBackend(tmp_path / "state.db")
+    monkeypatch.setattr(backend, "ping", lambda: False)
+    monkeypatch.setattr(main, "_state", backend)
+    monkeypatch.delenv("GOOGLE_API_KEY", raising=False)
+
+    response = get_ready()
+
+    assert response.status_code == 503
+    body = response.json()
+    assert body["status"] == "not ready"
+    assert body["llm"]["available"] is False
+    assert body["toolchains"] == TOOLCHAINS
+
+
+def test_toolchain_probe_is_cached_for_ttl(monkeypatch, toolchain_probes):
+    monkeypatch.setattr(main, "TOOLCHAIN_CHECK_TTL", 60)
+    main.toolchain_status()
+    main.toolchain_status()
+    assert len(toolchain_probes) == 1
+
+    monkeypatch.setattr(main, "TOOLCHAIN_CHECK_TTL", 0)
+    main.toolchain_status()
+    assert len(toolchain_probes) == 2